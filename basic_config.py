@@ -11,12 +11,20 @@ Requisitos:
   pip install pyserial pandas
 """
 
+import csv
+import json
+import logging
 import serial
 import time
+import numpy as np
 import pandas as pd
 import os
 import re
 import glob
+import queue
+import selectors
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # ---------- Parámetros ----------
 CARPETA_CSV = r"C:\Users\jesus\OneDrive\Documentos\CODIGOS\clase_ebueno"
@@ -24,19 +32,81 @@ COLUMNAS_REQUERIDAS = {"Serie", "Port", "Device", "User", "Password", "Ip-domain
 COLUMNA_BAUD_OPCIONAL = "Baud"
 BAUD_POR_DEFECTO = 9600
 
+# Tope de escritura serial: acota a un router trabado sin permitir
+# truncados (write_timeout=0 regresa tras el primer os.write, que puede
+# ser parcial, y nadie revisa cuántos bytes entraron). 2s dan de sobra
+# para el bloque fusionado más grande a 9600 baud.
+TIMEOUT_ESCRITURA = 2.0
+
 # Sincronizar el User con el Device cuando cambias el nombre
 SYNC_USER_WITH_DEVICE = True          # True = User se volverá igual a Device
 SYNC_ONLY_IF_R_PREFIX = True          # True = solo sincroniza si Device empieza con "R_"
 
-# (Opcional) activar prints de depuración
+# Modo lote: True = configura todos los equipos del CSV en paralelo, un
+# hilo por puerto serial y sin pausas de ENTER entre filas. Solo tiene
+# sentido cuando todos los routers están conectados a la vez.
+BATCH_MODE = False
+
+# (Opcional) activar trazas de depuración
 DEBUG = True
 
+logging.basicConfig(level=logging.DEBUG if DEBUG else logging.WARNING,
+                    format="[%(levelname)s] %(message)s")
+logger = logging.getLogger(__name__)
+
+# Puertos ya reclamados por hilos del modo lote: dos filas Port=auto no
+# deben descubrir el mismo COM, ni pisar un puerto fijo de otra fila.
+_PUERTOS_EN_USO = set()
+_PUERTOS_EN_USO_LOCK = threading.Lock()
+
 # Opcional: detectar puertos por sistema
 try:
     from serial.tools import list_ports
 except Exception:
     list_ports = None
 
+# Solo POSIX: ajustar atributos del tty
+try:
+    import termios
+except Exception:
+    termios = None
+
+# Opcional: detección de encoding y de dialecto CSV más robusta
+try:
+    from charset_normalizer import from_bytes as _detectar_bytes
+except Exception:
+    _detectar_bytes = None
+
+try:
+    import clevercsv
+except Exception:
+    clevercsv = None
+
+
+# Regexes compiladas una sola vez; el prompt va sobre bytes para no
+# decodificar en cada vuelta del poll.
+_PROMPT_RE = re.compile(rb"[>#]\s*$")
+_PROMPT_ANY_RE = re.compile(rb"[>#]")
+_PASSWORD_RE = re.compile(r"[Pp]assword")
+# Una sola alternación para las variantes 'SN:', 'Serial Number' y 'S/N',
+# sobre bytes: un solo paso por el 'show inventory' y sin re-decodificar.
+_SN_COMBINED_RE = re.compile(
+    rb"(?:SN:\s*|(?:Serial\s+Number|S/N)\s*[:#]?\s*)([A-Z0-9]+)", re.IGNORECASE
+)
+_HOST_RE = re.compile(r"\n([A-Za-z0-9\-_]+)#\s*$")
+_KEY_NAME_RE = re.compile(r"Key name:")
+
+# Constantes de bytes para las escrituras frecuentes: evita construir un
+# str intermedio y re-codificarlo en cada llamada.
+_CRLF = b"\r\n"
+_CMD_ENABLE = b"enable\r\n"
+
+
+# Invariante de I/O serial: los puertos se abren con timeout=0 (lecturas
+# no bloqueantes; las esperas reales las pone quien llama, vía
+# leer_hasta_prompt o el SerialReader) y write_timeout=TIMEOUT_ESCRITURA,
+# que bloquea hasta entregar el payload completo o falla con excepción.
+
 
 # ---------- Utilidades ----------
 def limpiar_consola():
@@ -44,40 +114,218 @@ def limpiar_consola():
         os.system("cls" if os.name == "nt" else "clear")
 
 
-def leer_hasta_prompt(conexion, timeout=3.0):
+def _selector_para(canal):
     """
-    Lee del puerto hasta detectar un prompt típico (> o #) o agotar timeout.
+    Selector registrado al FD del canal, o None si no aplica (Windows: el
+    handle de pyserial no es select-able; canales fake en pruebas tampoco).
     """
-    fin = time.time() + timeout
-    buf = ""
-    while time.time() < fin:
-        time.sleep(0.2)
-        chunk = conexion.read(conexion.in_waiting or 0).decode(errors="ignore")
-        if chunk:
-            buf += chunk
-            if re.search(r"[>#]\s*$", buf):
-                break
-    return buf
+    if os.name != "posix":
+        return None
+    try:
+        sel = selectors.DefaultSelector()
+        sel.register(canal.fileno(), selectors.EVENT_READ)
+        return sel
+    except Exception:
+        return None
+
+
+def _prompts_completos(buf, minimo):
+    """
+    True cuando el buffer termina en prompt Y ya aparecieron al menos
+    'minimo' prompts. Un bloque fusionado de N comandos produce N prompts
+    intermedios; quedarse con el primero dejaría comandos en vuelo y sus
+    errores ('% Invalid input') sin leer.
+    """
+    return bool(_PROMPT_RE.search(buf)) and len(_PROMPT_ANY_RE.findall(buf)) >= minimo
+
+
+class SerialReader(threading.Thread):
+    """
+    Hilo lector dedicado por canal: bloquea en canal.read() y acumula los
+    bytes en un buffer compartido, notificando por Condition. Así los
+    consumidores despiertan con el primer byte en vez de sondear cada 20ms
+    y ya no se pierden ráfagas cortas que llegaban entre sleeps.
+    """
+
+    def __init__(self, canal):
+        super().__init__(name=f"lector-{getattr(canal, 'name', '?')}", daemon=True)
+        self.canal = canal
+        self.buf = bytearray()
+        self.cond = threading.Condition()
+        self._parar = threading.Event()
+        self._selector = _selector_para(canal)
+
+    def run(self):
+        while not self._parar.is_set():
+            if self._selector:
+                # POSIX: bloquear en el FD; despierta en µs al llegar datos
+                try:
+                    if not self._selector.select(timeout=0.5):
+                        continue
+                except Exception:
+                    break
+            try:
+                datos = self.canal.read(max(1, self.canal.in_waiting or 0))
+            except Exception:
+                break  # puerto cerrado o desconectado
+            if datos:
+                with self.cond:
+                    self.buf += datos
+                    self.cond.notify_all()
+            elif not self._selector:
+                time.sleep(0.005)
+        if self._selector:
+            try:
+                self._selector.close()
+            except Exception:
+                pass
+
+    def tomar(self):
+        """Saca y devuelve todo lo acumulado (equivale a drenar el buffer)."""
+        with self.cond:
+            datos = bytes(self.buf)
+            del self.buf[:]
+        return datos
+
+    def esperar_prompt(self, timeout, minimo=1):
+        """
+        Espera hasta ver el prompt (o agotar timeout) y devuelve los bytes.
+        'minimo' = cuántos prompts deben haber llegado (uno por comando).
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: _prompts_completos(self.buf, minimo),
+                               timeout=timeout)
+            datos = bytes(self.buf)
+            del self.buf[:]
+        return datos
+
+    def detener(self):
+        self._parar.set()
+
+
+def _iniciar_lector(canal):
+    """Arranca un SerialReader y lo cuelga del canal para los helpers."""
+    lector = SerialReader(canal)
+    canal._lector = lector
+    lector.start()
+    return lector
+
+
+def _drenar(conexion):
+    """Vacía lo pendiente del canal (vía lector si lo hay) y lo devuelve."""
+    lector = getattr(conexion, "_lector", None)
+    if lector:
+        return lector.tomar()
+    return conexion.read(conexion.in_waiting or 0)
+
+
+def _limpiar_buffers(conexion):
+    """
+    Prepara el canal antes de escribir: espera (flush/tcdrain) a que lo ya
+    escrito termine de transmitirse — descartarlo cortaría un bloque aún en
+    la cola tx del kernel — y tira lo pendiente de *entrada*, a nivel OS y
+    en el lector. Es el reemplazo del viejo patrón 'read(in_waiting) y
+    tirar el resultado'.
+    """
+    try:
+        conexion.flush()
+    except Exception:
+        pass
+    try:
+        conexion.reset_input_buffer()
+    except Exception:
+        pass
+    lector = getattr(conexion, "_lector", None)
+    if lector:
+        lector.tomar()
+
+
+def _leer_disponible(conexion):
+    """Como _drenar pero decodificado, para quien quiere el texto."""
+    return _drenar(conexion).decode(errors="ignore")
 
 
-def ejecutar_comando(conexion, instruccion, pausa=1.0):
+def _cerrar_canal(canal):
+    """Cierra el canal deteniendo antes su lector, si tiene."""
+    lector = getattr(canal, "_lector", None)
+    if lector:
+        lector.detener()
+    try:
+        canal.close()
+    except Exception:
+        pass
+
+
+def leer_hasta_prompt(conexion, timeout=3.0, como_bytes=False, minimo_prompts=1):
     """
-    Envía un comando con CRLF, espera 'pausa' y lee lo disponible del buffer.
-    Luego intenta leer un poco más por si aparece el prompt.
+    Lee del puerto hasta detectar un prompt típico (> o #) o agotar timeout.
+    Con lector de fondo espera por Condition (latencia ~0); sin lector
+    bloquea en select() sobre el FD en POSIX, o cae al sondeo de 20ms en
+    Windows. como_bytes=True evita la decodificación para quien va a
+    parsear la respuesta con regex de bytes; minimo_prompts es para los
+    bloques fusionados, que producen un prompt por comando.
+    """
+    lector = getattr(conexion, "_lector", None)
+    if lector:
+        datos = lector.esperar_prompt(timeout, minimo=minimo_prompts)
+    else:
+        fin = time.time() + timeout
+        buf = bytearray()
+        sel = _selector_para(conexion)
+        try:
+            while True:
+                restante = fin - time.time()
+                if restante <= 0:
+                    break
+                if sel and not sel.select(timeout=restante):
+                    continue
+                chunk = conexion.read(conexion.in_waiting or 0)
+                if chunk:
+                    buf += chunk
+                    if _prompts_completos(buf, minimo_prompts):
+                        break
+                elif not sel:
+                    time.sleep(0.02)
+        finally:
+            if sel:
+                sel.close()
+        datos = bytes(buf)
+    return datos if como_bytes else datos.decode(errors="ignore")
+
+
+def ejecutar_comando(conexion, instruccion, pausa=1.0, como_bytes=False):
+    """
+    Envía un comando con CRLF y lee hasta que reaparezca el prompt.
+    'pausa' ya no es una espera fija: es el tope del peor caso; los comandos
+    rápidos (terminal length 0, exit, …) regresan en cuanto el router responde.
+    como_bytes=True devuelve la respuesta cruda, sin decodificar.
     """
     try:
-        _ = conexion.read(conexion.in_waiting or 0)  # drenar buffer previo
-        conexion.write((instruccion + "\r\n").encode())
-        time.sleep(pausa)
-        salida = conexion.read(conexion.in_waiting or 0).decode(errors="ignore")
-        salida += leer_hasta_prompt(conexion, timeout=1.2)
-        if DEBUG:
-            print(f"[DEBUG enviar] {instruccion!r}\n[DEBUG resp]\n{salida}\n---")
+        _limpiar_buffers(conexion)  # drenar buffer previo
+        conexion.write(instruccion.encode() + _CRLF)
+        salida = leer_hasta_prompt(conexion, timeout=pausa, como_bytes=como_bytes)
+        logger.debug("enviar %r resp:\n%s\n---", instruccion, salida)
         return salida
     except Exception as e:
         msg = f"[ERROR al enviar '{instruccion}']: {e}"
         print(msg)
-        return msg
+        return msg.encode() if como_bytes else msg
+
+
+def _enviar_bloque(canal, comandos, timeout=5.0):
+    """
+    Manda varios comandos de configuración en una sola escritura (IOS los
+    acepta encadenados) y espera hasta ver el prompt de cada uno (N
+    comandos = N prompts), en lugar de pagar una ida y vuelta por comando.
+    Solo para comandos que no bloquean la consola; 'crypto key generate
+    rsa' y 'write memory' van aparte.
+    """
+    _limpiar_buffers(canal)  # drenar buffer previo
+    canal.write(_CRLF.join(c.encode() for c in comandos) + _CRLF)
+    salida = leer_hasta_prompt(canal, timeout=timeout,
+                               minimo_prompts=len(comandos))
+    logger.debug("bloque %s resp:\n%s\n---", comandos, salida)
+    return salida
 
 
 def ir_a_enable(conexion, clave_enable=None):
@@ -85,29 +333,27 @@ def ir_a_enable(conexion, clave_enable=None):
     Entra a modo privilegiado.
     Si el router pide 'Password:', envía la clave (si se proporcionó).
     """
-    _ = conexion.read(conexion.in_waiting or 0)
-    conexion.write(b"enable\r\n")
+    _limpiar_buffers(conexion)
+    conexion.write(_CMD_ENABLE)
     time.sleep(0.4)
 
-    salida = conexion.read(conexion.in_waiting or 0).decode(errors="ignore")
+    salida = _leer_disponible(conexion)
 
     # Si pide password
-    if re.search(r"[Pp]assword", salida):
-        if DEBUG:
-            print("[DEBUG] Router pide contraseña de enable")
+    if _PASSWORD_RE.search(salida):
+        logger.debug("Router pide contraseña de enable")
         if clave_enable:
-            conexion.write((clave_enable + "\r\n").encode())
+            conexion.write(clave_enable.encode() + _CRLF)
             time.sleep(0.5)
-            salida += conexion.read(conexion.in_waiting or 0).decode(errors="ignore")
+            salida += _leer_disponible(conexion)
         else:
             # Enviar Enter vacío por si no hay clave configurada
-            conexion.write(b"\r\n")
+            conexion.write(_CRLF)
             time.sleep(0.4)
-            salida += conexion.read(conexion.in_waiting or 0).decode(errors="ignore")
+            salida += _leer_disponible(conexion)
 
     salida += leer_hasta_prompt(conexion, timeout=3.0)
-    if DEBUG:
-        print(f"[DEBUG enable] {salida}")
+    logger.debug("enable: %s", salida)
     return salida
 
 
@@ -115,83 +361,267 @@ def buscar_serial(canal_serial):
     """
     Intenta obtener No. de serie vía 'show inventory'.
     Soporta variantes 'SN:', 'Serial Number' o 'S/N'.
+    El resultado se memoiza en el canal (solo en el canal: en el flujo del
+    CSV se cambia de router en el mismo COM entre filas, así que un cache
+    por puerto devolvería la serie del equipo anterior y rompería la
+    validación contra el CSV).
     """
+    serie = getattr(canal_serial, "_cached_serial", None)
+    if serie:
+        return serie
+
     ejecutar_comando(canal_serial, "terminal length 0", pausa=0.3)
-    resp = ejecutar_comando(canal_serial, "show inventory", pausa=2.8)
+    resp = ejecutar_comando(canal_serial, "show inventory", pausa=2.8, como_bytes=True)
 
-    m = re.search(r"SN:\s*([A-Z0-9]+)", resp)
-    if m:
-        return m.group(1).strip()
+    m = _SN_COMBINED_RE.search(resp)
+    serie = m.group(1).decode() if m else None
 
-    m = re.search(r"(Serial Number|S/N)\s*[:#]?\s*([A-Z0-9]+)", resp, flags=re.IGNORECASE)
-    if m:
-        return m.group(2).strip()
+    if serie:
+        canal_serial._cached_serial = serie
+    return serie
 
-    return None
+
+# Adaptadores USB-serial típicos de consolas Cisco (VID, PID):
+# FTDI, Prolific, SiLabs CP210x y CH340. Se prueban primero.
+_VID_PID_PREFERIDOS = {
+    (0x0403, 0x6001),  # FTDI FT232
+    (0x0403, 0x6015),  # FTDI FT231X
+    (0x067B, 0x2303),  # Prolific PL2303
+    (0x10C4, 0xEA60),  # SiLabs CP210x
+    (0x1A86, 0x7523),  # WCH CH340
+}
+
+
+# Cache de enumeración: entre filas consecutivas del CSV la topología COM
+# casi nunca cambia, así que no vale la pena repetir list_ports/WMI cada vez.
+_PUERTOS_CACHE = (0.0, None)   # (time.monotonic() de la última enumeración, lista)
+_PUERTOS_CACHE_TTL = 5.0
+
+# Último puerto donde se encontró un Cisco; se prueba primero la próxima vez.
+_last_good_port = None
+
+# Versión persistente del atajo anterior: en un laboratorio fijo el puerto
+# bueno casi siempre es el mismo que en la corrida pasada.
+_ARCHIVO_CACHE_PUERTO = os.path.join(os.path.expanduser("~"), ".clase_ebueno_ports.json")
+_CACHE_PUERTO_MAX_EDAD = 24 * 3600  # segundos
+
+
+def _cargar_puerto_persistido():
+    """Puerto guardado por la corrida anterior, si es reciente y aún existe."""
+    try:
+        with open(_ARCHIVO_CACHE_PUERTO, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+    except Exception:
+        return None
+    if time.time() - datos.get("timestamp", 0) > _CACHE_PUERTO_MAX_EDAD:
+        return None
+    puerto = datos.get("port")
+    if not puerto:
+        return None
+    if list_ports:
+        try:
+            if puerto not in {p.device for p in list_ports.comports()}:
+                return None
+        except Exception:
+            pass
+    return puerto
+
+
+def _persistir_puerto(puerto, serie):
+    """Guarda el puerto descubierto para arrancar por ahí la próxima corrida."""
+    datos = {"port": puerto, "serial": serie, "timestamp": time.time()}
+    if list_ports:
+        try:
+            for p in list_ports.comports():
+                if p.device == puerto:
+                    datos["vid"], datos["pid"] = p.vid, p.pid
+                    break
+        except Exception:
+            pass
+    try:
+        with open(_ARCHIVO_CACHE_PUERTO, "w", encoding="utf-8") as f:
+            json.dump(datos, f)
+    except Exception:
+        pass
 
 
 def puertos_disponibles():
-    encontrados = []
+    """
+    Lista puertos candidatos, poniendo primero los que tienen VID/PID de
+    adaptador de consola conocido: así la autodetección corta en seguida
+    en un setup típico en vez de gastar ~4s por puerto muerto.
+    El resultado se cachea unos segundos para no re-enumerar por cada fila.
+    """
+    global _PUERTOS_CACHE
+    marca, lista = _PUERTOS_CACHE
+    if lista is not None and time.monotonic() - marca < _PUERTOS_CACHE_TTL:
+        return lista
+
+    preferidos, otros = [], []
     if list_ports:
         try:
-            encontrados = [p.device for p in list_ports.comports()]
+            for p in list_ports.comports():
+                if (p.vid, p.pid) in _VID_PID_PREFERIDOS:
+                    preferidos.append(p.device)
+                else:
+                    otros.append(p.device)
         except Exception:
-            encontrados = []
+            preferidos, otros = [], []
+    encontrados = preferidos + otros
     if not encontrados:
         # Fallback típico
         encontrados = [f"COM{i}" for i in range(3, 21)]
-    if DEBUG:
-        print(f"[DEBUG] Puertos candidatos: {encontrados}")
+    logger.debug("Puertos candidatos: %s (preferidos: %s)", encontrados, preferidos)
+    _PUERTOS_CACHE = (time.monotonic(), encontrados)
     return encontrados
 
 
-def probar_puerto(puerto, baudrate=BAUD_POR_DEFECTO, timeout=1.0):
+def _set_low_latency(canal):
     """
-    Abre el puerto, espera, intenta 'show inventory' y regresa (canal, serie) si tiene respuesta.
-    Cierra y devuelve (None, None) si falla o no es Cisco.
+    Baja el latency_timer del driver USB-serial (FTDI y compañía traen 16ms
+    por defecto, y cada ida y vuelta de un byte paga ese tick completo).
+    Best-effort: en chips que no lo soportan simplemente no hace nada.
     """
+    # pyserial ya sabe poner ASYNC_LOW_LATENCY vía ioctl (TIOCGSERIAL/TIOCSSERIAL)
     try:
-        canal = serial.Serial(puerto, baudrate=baudrate, timeout=timeout)
-        time.sleep(2)  # estabilizar
+        canal.set_low_latency_mode(True)
+    except Exception:
+        pass
+    # En Linux el driver FTDI además expone el timer en sysfs
+    if os.name == "posix":
+        try:
+            tty = os.path.basename(canal.name or "")
+            ruta = f"/sys/bus/usb-serial/devices/{tty}/latency_timer"
+            if os.path.exists(ruta):
+                with open(ruta, "w") as f:
+                    f.write("1")
+        except Exception:
+            pass
 
-        # Pequeña lectura inicial para limpiar banner
-        _ = canal.read(canal.in_waiting or 0)
 
-        # Enter para obtener prompt
-        canal.write(b"\r\n")
-        time.sleep(0.3)
-        _ = canal.read(canal.in_waiting or 0)
+def _ajustar_buffers(canal):
+    """
+    Achica los buffers del driver y pide que las lecturas regresen con el
+    primer byte disponible, en vez de esperar a llenar el buffer por
+    defecto del OS (4-16KB). Best-effort igual que _set_low_latency.
+    """
+    # Windows: pyserial expone el tamaño de buffer del driver
+    try:
+        canal.set_buffer_size(rx_size=4096, tx_size=4096)
+    except Exception:
+        pass
+    # POSIX: VMIN=0 / VTIME=1 -> read() regresa en cuanto haya algo
+    if termios:
+        try:
+            attrs = termios.tcgetattr(canal.fd)
+            attrs[6][termios.VMIN] = 0
+            attrs[6][termios.VTIME] = 1
+            termios.tcsetattr(canal.fd, termios.TCSANOW, attrs)
+        except Exception:
+            pass
+
+
+def _estabilizar(canal, timeout=2.0):
+    """
+    Handshake activo tras abrir el puerto: manda un Enter y espera el prompt.
+    Si el router ya está listo regresa en milisegundos; si no, espera a lo
+    sumo 'timeout' (lo que antes era un sleep(2) incondicional).
+    """
+    _limpiar_buffers(canal)  # limpiar banner pendiente
+    canal.write(_CRLF)
+    leer_hasta_prompt(canal, timeout=timeout)
+
+
+def probar_puerto(puerto, baudrate=BAUD_POR_DEFECTO, timeout=0):
+    """
+    Abre el puerto, espera, intenta 'show inventory' y regresa (canal, serie) si tiene respuesta.
+    Cierra y devuelve (None, None) si falla o no es Cisco.
+    """
+    try:
+        canal = serial.Serial(puerto, baudrate=baudrate, timeout=timeout,
+                              write_timeout=TIMEOUT_ESCRITURA)
+        _set_low_latency(canal)
+        _ajustar_buffers(canal)
+        _iniciar_lector(canal)
+        _estabilizar(canal)
 
         serie = buscar_serial(canal)
         if serie:
-            if DEBUG:
-                print(f"[DEBUG] {puerto}: Cisco detectado, serie={serie}")
+            logger.debug("%s: Cisco detectado, serie=%s", puerto, serie)
             return canal, serie
 
         # Si no devolvió serie, igual se pudo abrir pero no respondió como Cisco
-        canal.close()
-        if DEBUG:
-            print(f"[DEBUG] {puerto}: abierto pero sin 'show inventory' válido")
+        _cerrar_canal(canal)
+        logger.debug("%s: abierto pero sin 'show inventory' válido", puerto)
         return None, None
     except Exception as e:
-        if DEBUG:
-            print(f"[DEBUG] {puerto}: no se pudo abrir ({e})")
+        logger.debug("%s: no se pudo abrir (%s)", puerto, e)
         return None, None
 
 
+def _reclamar_puerto(puerto):
+    """Marca un puerto como ocupado para otros hilos (solo en modo lote)."""
+    if BATCH_MODE:
+        with _PUERTOS_EN_USO_LOCK:
+            _PUERTOS_EN_USO.add(puerto)
+
+
 def autodetectar_conexion(baudrate=BAUD_POR_DEFECTO):
-    if DEBUG:
-        print(f"[DEBUG] Autodetección con baud={baudrate}")
-    for p in puertos_disponibles():
-        if DEBUG:
-            print(f"[DEBUG] Probando {p}…")
-        canal, serie = probar_puerto(p, baudrate=baudrate)
-        if canal and serie:
-            if DEBUG:
-                print(f"[DEBUG] ¡Encontrado! Puerto={p}, Serie={serie}")
-            return canal, p, serie
-    if DEBUG:
-        print("[DEBUG] No se encontró equipo Cisco en puertos probados.")
+    """
+    Prueba todos los puertos candidatos en paralelo (cada sondeo es puro I/O,
+    así que N hilos tardan lo que un solo puerto). Se queda con el primero
+    que responda con serie válida y cierra los canales perdedores.
+    El puerto que funcionó la vez anterior se intenta solo, antes que nada.
+    """
+    global _last_good_port
+    logger.debug("Autodetección con baud=%s", baudrate)
+
+    # Atajo: el último puerto bueno casi siempre sigue siendo el bueno
+    # (primero el de esta corrida; si no hay, el persistido de la anterior)
+    if not _last_good_port:
+        _last_good_port = _cargar_puerto_persistido()
+    if _last_good_port:
+        with _PUERTOS_EN_USO_LOCK:
+            libre = _last_good_port not in _PUERTOS_EN_USO
+        if libre:
+            canal, serie = probar_puerto(_last_good_port, baudrate=baudrate)
+            if canal and serie:
+                logger.debug("Reusando último puerto bueno: %s", _last_good_port)
+                _reclamar_puerto(_last_good_port)
+                _persistir_puerto(_last_good_port, serie)
+                return canal, _last_good_port, serie
+            _last_good_port = None
+
+    puertos = puertos_disponibles()
+    with _PUERTOS_EN_USO_LOCK:
+        puertos = [p for p in puertos if p not in _PUERTOS_EN_USO]
+    if not puertos:
+        return None, None, None
+
+    ganador = (None, None, None)
+    with ThreadPoolExecutor(max_workers=len(puertos)) as pool:
+        futuros = {pool.submit(probar_puerto, p, baudrate): p for p in puertos}
+        for futuro in as_completed(futuros):
+            if futuro.cancelled():
+                # Sondeo cancelado antes de arrancar; result() lanzaría
+                continue
+            canal, serie = futuro.result()
+            if canal and serie and ganador[0] is None:
+                ganador = (canal, futuros[futuro], serie)
+                # Lo que aún no arrancó se cancela; lo que siga corriendo
+                # cerrará su canal al caer en la rama de abajo.
+                for f in futuros:
+                    f.cancel()
+            elif canal:
+                _cerrar_canal(canal)
+
+    if ganador[0]:
+        _last_good_port = ganador[1]
+        _reclamar_puerto(ganador[1])
+        _persistir_puerto(ganador[1], ganador[2])
+        logger.debug("¡Encontrado! Puerto=%s, Serie=%s", ganador[1], ganador[2])
+        return ganador
+    logger.debug("No se encontró equipo Cisco en puertos probados.")
     return None, None, None
 
 
@@ -211,9 +641,13 @@ def aplicar_config(puerto, hostname, usuario, clave, dominio, serie_csv, baudrat
                 print("❌ No se encontró ningún puerto válido.")
                 return False
         else:
-            canal = serial.Serial(puerto, baudrate=baudrate, timeout=1)
+            canal = serial.Serial(puerto, baudrate=baudrate, timeout=0,
+                                  write_timeout=TIMEOUT_ESCRITURA)
+            _set_low_latency(canal)
+            _ajustar_buffers(canal)
+            _iniciar_lector(canal)
             puerto_real = puerto
-            time.sleep(2)
+            _estabilizar(canal)
             serie_detectada = buscar_serial(canal)
 
         print(f"\n🔗 Conectado en {puerto_real} (baud {baudrate}). Serie detectada: {serie_detectada or 'N/A'}")
@@ -221,81 +655,152 @@ def aplicar_config(puerto, hostname, usuario, clave, dominio, serie_csv, baudrat
         # 2) Validaciones de serie
         if not serie_detectada:
             print("⚠ No se pudo leer la serie con 'show inventory'. Saltando configuración.")
-            canal.close()
+            _cerrar_canal(canal)
             return False
 
         if str(serie_detectada).strip().upper() != str(serie_csv).strip().upper():
             print(f"⚠ Serie no coincide. Equipo={serie_detectada} | CSV={serie_csv}. Saltando configuración.")
-            canal.close()
+            _cerrar_canal(canal)
             return False
 
-        # 3) Configuración (modo privilegiado + conf t)
+        # 3) Configuración (modo privilegiado + bloque conf t fusionado)
         ir_a_enable(canal, clave_enable=clave if clave else None)
         ejecutar_comando(canal, "terminal length 0", pausa=0.3)
-        ejecutar_comando(canal, "configure terminal", pausa=0.5)
 
-        # Hostname
-        ejecutar_comando(canal, f"hostname {hostname}", pausa=0.5)
+        # ¿Ya hay llave RSA? En re-runs es lo normal, y regenerarla cuesta
+        # ~3s de consola bloqueada. Se consulta antes de entrar a conf t.
+        generar_llave = False
+        if dominio:
+            llaves = ejecutar_comando(canal, "show crypto key mypubkey rsa", pausa=0.8)
+            generar_llave = not _KEY_NAME_RE.search(llaves)
+
+        bloque = ["configure terminal", f"hostname {hostname}"]
 
         # Usuario (ya viene sincronizado si aplica)
         if usuario and clave:
-            ejecutar_comando(canal, f"username {usuario} privilege 15 secret {clave}", pausa=0.6)
+            bloque.append(f"username {usuario} privilege 15 secret {clave}")
 
-        # Dominio y SSH
+        # Dominio
         if dominio:
-            ejecutar_comando(canal, f"ip domain-name {dominio}", pausa=0.4)
-        ejecutar_comando(canal, "no ip domain-lookup", pausa=0.2)
-        ejecutar_comando(canal, "service password-encryption", pausa=0.2)
+            bloque.append(f"ip domain-name {dominio}")
+        bloque.append("no ip domain-lookup")
+        bloque.append("service password-encryption")
+        _enviar_bloque(canal, bloque)
 
+        # SSH: el crypto bloquea la consola varios segundos, va aparte
         if dominio:
-            ejecutar_comando(canal, "crypto key generate rsa modulus 1024", pausa=3.2)
-            ejecutar_comando(canal, "line vty 0 4", pausa=0.3)
-            ejecutar_comando(canal, "login local", pausa=0.2)
-            ejecutar_comando(canal, "transport input ssh", pausa=0.2)
-            ejecutar_comando(canal, "transport output ssh", pausa=0.2)
-            ejecutar_comando(canal, "exit", pausa=0.2)
-            ejecutar_comando(canal, "ip ssh version 2", pausa=0.3)
+            if generar_llave:
+                ejecutar_comando(canal, "crypto key generate rsa modulus 1024", pausa=3.2)
+            else:
+                logger.debug("Llave RSA ya existente; no se regenera")
+            _enviar_bloque(canal, [
+                "line vty 0 4",
+                "login local",
+                "transport input ssh",
+                "transport output ssh",
+                "exit",
+                "ip ssh version 2",
+            ])
 
         ejecutar_comando(canal, "end", pausa=0.3)
         ejecutar_comando(canal, "write memory", pausa=1.5)
 
         # 4) Confirmar
-        ejecutar_comando(canal, "", pausa=0.3)  # Enter para “repintar”
-        echo = canal.read(canal.in_waiting or 0).decode(errors="ignore")
-        m = re.search(r"\n([A-Za-z0-9\-_]+)#\s*$", echo)
+        echo = ejecutar_comando(canal, "", pausa=0.3)  # Enter para “repintar”
+        echo += _leer_disponible(canal)
+        m = _HOST_RE.search(echo)
         host_visto = m.group(1) if m else "NO_DETECTADO"
         print(f"✅ Configuración aplicada. Prompt actual: {host_visto}#")
 
-        canal.close()
+        _cerrar_canal(canal)
         return True
 
     except Exception as e:
         if canal:
+            _cerrar_canal(canal)
+        print(f"❌ Error al configurar {hostname} ({puerto_real}): {e}")
+        return False
+
+
+def _dialecto_csv(ruta):
+    """
+    Husmea los primeros 64KB del archivo para deducir separador, quotechar
+    y encoding. Los CSV exportados desde Excel/Sheets llegan con ';', '\\t'
+    o BOM y con encoding utf-8 la validación de columnas fallaba con un
+    'falta columna' críptico. Devuelve (sep, quotechar, encoding).
+    """
+    sep, quote, encoding = ",", '"', "utf-8"
+    try:
+        with open(ruta, "rb") as f:
+            muestra = f.read(65536)
+    except OSError:
+        return sep, quote, encoding
+
+    if muestra.startswith(b"\xef\xbb\xbf"):
+        encoding = "utf-8-sig"
+    elif _detectar_bytes:
+        try:
+            mejor = _detectar_bytes(muestra).best()
+            if mejor and mejor.encoding:
+                encoding = mejor.encoding
+        except Exception:
+            pass
+
+    texto = muestra.decode(encoding, errors="ignore")
+    try:
+        dialecto = csv.Sniffer().sniff(texto, delimiters=",;\t|")
+        sep, quote = dialecto.delimiter, dialecto.quotechar
+    except Exception:
+        # El Sniffer estándar se rinde fácil; CleverCSV acierta más si está
+        if clevercsv:
             try:
-                canal.close()
+                dialecto = clevercsv.Sniffer().sniff(texto)
+                if dialecto and dialecto.delimiter:
+                    sep = dialecto.delimiter
+                    quote = dialecto.quotechar or quote
             except Exception:
                 pass
-        print(f"❌ Error al configurar {hostname} ({puerto_real}): {e}")
-        return False
+
+    logger.debug("Dialecto CSV: sep=%r quote=%r encoding=%s", sep, quote, encoding)
+    return sep, quote, encoding
+
+
+def _leer_csv(ruta, chunksize=None):
+    """
+    Lee el CSV completo (chunksize=None) o como iterador de DataFrames.
+    En modo chunked se fuerza dtype=str (todo se trata como texto de todos
+    modos) y solo se cargan las columnas que usamos, así un inventario
+    enorme no se parsea entero en memoria.
+    """
+    sep, quote, encoding = _dialecto_csv(ruta)
+    if chunksize:
+        usadas = COLUMNAS_REQUERIDAS | {COLUMNA_BAUD_OPCIONAL}
+        return pd.read_csv(
+            ruta,
+            sep=sep,
+            quotechar=quote,
+            encoding=encoding,
+            dtype=str,
+            usecols=lambda c: c.strip() in usadas,
+            chunksize=chunksize,
+        )
+    return pd.read_csv(ruta, sep=sep, quotechar=quote, encoding=encoding)
 
 
-def cargar_csv_auto(carpeta):
+def cargar_csv_auto(carpeta, chunksize=None):
     preferido = os.path.join(carpeta, "Data.csv")
-    if DEBUG:
-        print(f"[DEBUG] Buscando CSV preferido: {preferido}")
+    logger.debug("Buscando CSV preferido: %s", preferido)
     if os.path.isfile(preferido):
-        if DEBUG: print("[DEBUG] CSV preferido encontrado. Leyendo UTF-8…")
-        return pd.read_csv(preferido, encoding="utf-8"), preferido
+        logger.debug("CSV preferido encontrado. Leyendo…")
+        return _leer_csv(preferido, chunksize), preferido
 
     archivos = glob.glob(os.path.join(carpeta, "*.csv"))
-    if DEBUG:
-        print(f"[DEBUG] CSVs encontrados: {archivos}")
+    logger.debug("CSVs encontrados: %s", archivos)
     if not archivos:
         raise FileNotFoundError(f"No se encontró ningún .csv en: {carpeta}")
 
-    if DEBUG:
-        print(f"[DEBUG] Usando {archivos[0]} (UTF-8)")
-    return pd.read_csv(archivos[0], encoding="utf-8"), archivos[0]
+    logger.debug("Usando %s", archivos[0])
+    return _leer_csv(archivos[0], chunksize), archivos[0]
 
 
 def validar_columnas(df):
@@ -308,6 +813,48 @@ def validar_columnas(df):
         )
 
 
+def _procesar_en_lote(cola_de_trabajo):
+    """
+    Configura varios dispositivos en paralelo, un hilo por puerto serial
+    (cada línea serie es independiente, así que el tiempo total baja de la
+    suma por equipo al máximo por equipo). Las filas con Port=auto van
+    juntas en su propio hilo y reclaman los puertos que descubren vía
+    _PUERTOS_EN_USO para no chocar entre sí ni con los puertos fijos.
+    """
+    resultados = queue.Queue()
+
+    # Agrupar por puerto; varias filas del mismo puerto van en serie
+    grupos = {}
+    for fila in cola_de_trabajo:
+        puerto = str(fila[0]).strip()
+        clave = "auto" if puerto.lower() == "auto" else puerto
+        grupos.setdefault(clave, []).append(fila)
+
+    # Los puertos fijos quedan reservados desde el arranque
+    with _PUERTOS_EN_USO_LOCK:
+        _PUERTOS_EN_USO.update(p for p in grupos if p != "auto")
+
+    def trabajador(filas):
+        for (p, dev, u, pas, dom, serie, baud) in filas:
+            exito = aplicar_config(p, dev, u, pas, dom, serie, baudrate=baud)
+            resultados.put((dev, exito))
+
+    hilos = [threading.Thread(target=trabajador, args=(filas,)) for filas in grupos.values()]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    with _PUERTOS_EN_USO_LOCK:
+        _PUERTOS_EN_USO.clear()
+
+    ok, fail = [], []
+    while not resultados.empty():
+        dev, exito = resultados.get()
+        (ok if exito else fail).append(dev)
+    return ok, fail
+
+
 # ---------- Flujo principal ----------
 def ver_opciones():
     limpiar_consola()
@@ -332,8 +879,12 @@ def modo_interactivo():
                 return
             print(f"\n✅ Conectado automáticamente en {puerto_real} (baud {baud})")
         else:
-            sesion = serial.Serial(puerto_usr, baudrate=baud, timeout=1)
-            time.sleep(2)
+            sesion = serial.Serial(puerto_usr, baudrate=baud, timeout=0,
+                                   write_timeout=TIMEOUT_ESCRITURA)
+            _set_low_latency(sesion)
+            _ajustar_buffers(sesion)
+            _iniciar_lector(sesion)
+            _estabilizar(sesion)
             print(f"\n✅ Conectado en {puerto_usr} (baud {baud})")
 
         print("👉 Escribe comandos. Para salir usa 'salir'.\n")
@@ -344,69 +895,90 @@ def modo_interactivo():
                 break
             respuesta = ejecutar_comando(sesion, cmd_linea, pausa=2)
             print(f"\n📤 Respuesta:\n{respuesta}")
-        sesion.close()
+        _cerrar_canal(sesion)
     except Exception as e:
         if sesion:
-            try: sesion.close()
-            except: pass
+            _cerrar_canal(sesion)
         print(f"❌ Error: {e}")
     input("ENTER para volver al menú...")
 
 
 def proceso_desde_csv():
     limpiar_consola()
+
+    # Construir cola con sincronización de usuario, leyendo el CSV por
+    # bloques para no cargar un inventario gigante completo en memoria.
+    cola_de_trabajo = []
     try:
-        tabla_datos, ruta_archivo = cargar_csv_auto(CARPETA_CSV)
-        validar_columnas(tabla_datos)
+        bloques, ruta_archivo = cargar_csv_auto(CARPETA_CSV, chunksize=10000)
+        primera = True
+        for tabla_datos in bloques:
+            if primera:
+                validar_columnas(tabla_datos)
+                primera = False
+
+            # Asegurar columna Baud
+            if COLUMNA_BAUD_OPCIONAL not in tabla_datos.columns:
+                tabla_datos[COLUMNA_BAUD_OPCIONAL] = BAUD_POR_DEFECTO
+
+            # Limpieza vectorizada (iterrows + str(...).strip() por celda era
+            # el camino lento clásico de pandas)
+            for col in ("Serie", "Port", "Device", "User", "Password", "Ip-domain"):
+                tabla_datos[col] = tabla_datos[col].astype(str).str.strip()
+            bauds = (
+                pd.to_numeric(tabla_datos[COLUMNA_BAUD_OPCIONAL], errors="coerce")
+                .fillna(BAUD_POR_DEFECTO)
+                .astype(int)
+            )
+
+            # Sincronización de usuario, también vectorizada
+            if SYNC_USER_WITH_DEVICE:
+                if SYNC_ONLY_IF_R_PREFIX:
+                    sincronizar = tabla_datos["Device"].str.startswith("R_")
+                else:
+                    sincronizar = True
+                usuarios = np.where(sincronizar, tabla_datos["Device"], tabla_datos["User"])
+            else:
+                usuarios = tabla_datos["User"]
+
+            cola_de_trabajo.extend(zip(
+                tabla_datos["Port"],
+                tabla_datos["Device"],
+                usuarios,
+                tabla_datos["Password"],
+                tabla_datos["Ip-domain"],
+                tabla_datos["Serie"],
+                bauds.tolist(),
+            ))
     except Exception as e:
         print(f"\n❌ ERROR al cargar CSV: {e}")
         input("ENTER para volver al menú...")
         return
 
-    # Asegurar columna Baud
-    if COLUMNA_BAUD_OPCIONAL not in tabla_datos.columns:
-        tabla_datos[COLUMNA_BAUD_OPCIONAL] = BAUD_POR_DEFECTO
-
-    print("\n📂 Dispositivos encontrados en el archivo:")
-    print(tabla_datos)
-
-    # Construir cola con sincronización de usuario
-    cola_de_trabajo = []
-    for _, f in tabla_datos.iterrows():
-        port   = str(f["Port"]).strip()
-        device = str(f["Device"]).strip()
-        user   = str(f["User"]).strip()
-        pwd    = str(f["Password"]).strip()
-        domain = str(f["Ip-domain"]).strip()
-        serie  = str(f["Serie"]).strip()
-        baud   = int(f[COLUMNA_BAUD_OPCIONAL]) if str(f[COLUMNA_BAUD_OPCIONAL]).strip().isdigit() else BAUD_POR_DEFECTO
-
-        if SYNC_USER_WITH_DEVICE and (not SYNC_ONLY_IF_R_PREFIX or device.startswith("R_")):
-            user_final = device
-        else:
-            user_final = user
-
-        cola_de_trabajo.append((port, device, user_final, pwd, domain, serie, baud))
+    print(f"\n📂 Dispositivos encontrados en {ruta_archivo}: {len(cola_de_trabajo)}")
 
     print("\n📋 Lista de dispositivos y sus configuraciones:")
     for (p, dev, u, pas, dom, serie, baud) in cola_de_trabajo:
         print(f"Port={p} | Hostname={dev} | User={u} | Dom={dom} | Serie={serie} | Baud={baud}")
     input("ENTER para continuar...")
 
-    ok, fail = [], []
-
-    for idx, (p, dev, u, pas, dom, serie, baud) in enumerate(cola_de_trabajo, start=1):
-        limpiar_consola()
-        print(f"\n➡ Dispositivo {idx}: {dev} (Serie esperada: {serie}) | Port={p} | Baud={baud}")
-        input("Conecte el equipo y ENTER...")
-
-        if aplicar_config(p, dev, u, pas, dom, serie, baudrate=baud):
-            ok.append(dev)
-        else:
-            fail.append(dev)
-
-        print("=================================================")
-        input("ENTER para continuar...")
+    if BATCH_MODE:
+        print("\n🚀 Modo lote: configurando todos los puertos en paralelo...")
+        ok, fail = _procesar_en_lote(cola_de_trabajo)
+    else:
+        ok, fail = [], []
+        for idx, (p, dev, u, pas, dom, serie, baud) in enumerate(cola_de_trabajo, start=1):
+            limpiar_consola()
+            print(f"\n➡ Dispositivo {idx}: {dev} (Serie esperada: {serie}) | Port={p} | Baud={baud}")
+            input("Conecte el equipo y ENTER...")
+
+            if aplicar_config(p, dev, u, pas, dom, serie, baudrate=baud):
+                ok.append(dev)
+            else:
+                fail.append(dev)
+
+            print("=================================================")
+            input("ENTER para continuar...")
 
     limpiar_consola()
     print("📊 Resumen:")
@@ -417,8 +989,7 @@ def proceso_desde_csv():
 
 # ---------- Main ----------
 if __name__ == "__main__":
-    if DEBUG:
-        print(f"[DEBUG] Iniciando. CSV en: {CARPETA_CSV}")
+    logger.debug("Iniciando. CSV en: %s", CARPETA_CSV)
     while True:
         ver_opciones()
         opt = input("Selecciona una opción: ").strip()